@@ -1,9 +1,12 @@
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from dotenv import load_dotenv
 
+from src.utils.env import ensure_env
 from src.utils.logger import log_experiment, ActionType
+from src.utils.fast_stat import fast_size
 
 # Toolsmith helpers
 from src.tools.cli_tools import parse_args, prepare_payloads
@@ -12,9 +15,64 @@ from src.tools.file_tools import write_file, backup_file, compile_auditor_prompt
 from src.orchestrator.refactoring_pipeline import run_refactoring_pipeline
 
 # we should remove ipynb later
-extensions_set = {".py", ".ipynb"}
+# tuple for str.endswith: one C-level call per file instead of a
+# splitext + lower + set lookup
+_SUFFIXES = (".py", ".ipynb")
 
-load_dotenv()
+ensure_env()
+
+
+def _scan_subtree(root_dir: str, ignore_names: frozenset, max_size: int):
+    """
+    Walk one directory tree and return (found, too_big) lists of path
+    strings. Picklable so subtrees can be sharded across worker processes.
+    """
+    found = []
+    too_big = []
+
+    if hasattr(os, "fwalk"):
+        # POSIX: fwalk hands us an open dir fd, so the size check below is a
+        # single fstatat relative to it instead of a full path resolution
+        for root, dirs, files, dirfd in os.fwalk(root_dir, follow_symlinks=False):
+            # prune ignored directories so fwalk never descends into them
+            dirs[:] = [d for d in dirs if d not in ignore_names]
+            for name in files:
+                if name in ignore_names:
+                    continue
+                if not name.endswith(_SUFFIXES) and not name.lower().endswith(_SUFFIXES):
+                    continue
+                # only candidate files reach the size check; statx asks
+                # for STATX_SIZE only instead of filling every stat field
+                if fast_size(name, dir_fd=dirfd) > max_size:
+                    too_big.append(os.path.join(root, name))
+                else:
+                    found.append(os.path.join(root, name))
+    else:
+        # Windows has no fwalk: iterative scandir walk, DirEntry caches the
+        # dirent metadata so is_dir/is_file don't cost an extra stat syscall
+        stack = [root_dir]
+        while stack:
+            current = stack.pop()
+            with os.scandir(current) as it:
+                for entry in it:
+                    # apply the ignore filter here so ignored subtrees are never pushed
+                    if entry.name in ignore_names:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    # we keep this as security measure
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    nm = entry.name
+                    if not nm.endswith(_SUFFIXES) and not nm.lower().endswith(_SUFFIXES):
+                        continue
+                    if entry.stat().st_size > max_size:
+                        too_big.append(entry.path)
+                    else:
+                        found.append(entry.path)
+
+    return found, too_big
 
 
 # --------------------------
@@ -69,24 +127,52 @@ def main():
         dir_path = Path(args.dir)
         # this should work recursively, when you get a directory, you get the subfiles too
         
-        for root, dirs, files in os.walk(dir_path):
-            dirs[:] = [d for d in dirs if d not in ignore_files]
-            # check if the files is not in the whitelist, is of appropriate type.
-            for name in files:
-                f = Path(root) / name
-                # we keep this as security measure
-                if not f.is_file():
+        ignore_names = frozenset(ignore_files)
+
+        # scan dir_path itself one level deep: files here are handled in
+        # the parent, subdirectories become shards for the pool below
+        subdirs = []
+        found = []
+        too_big = []
+        with os.scandir(str(dir_path)) as it:
+            for entry in it:
+                if entry.name in ignore_names:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
                     continue
-                if f.name in ignore_files:
+                if not entry.is_file(follow_symlinks=False):
                     continue
-                if f.suffix.lower() not in extensions_set:
+                nm = entry.name
+                if not nm.endswith(_SUFFIXES) and not nm.lower().endswith(_SUFFIXES):
                     continue
-                # print(f, f.name)
-                if f.stat().st_size > MAX_SIZE:
-                    print(f"{f} is too big")
-                    sys.exit(2)
-                # add the file name (using f itself gives us directly the path, not only the name)
-                file_names_list.append(f)
+                if entry.stat().st_size > MAX_SIZE:
+                    too_big.append(entry.path)
+                else:
+                    found.append(entry.path)
+
+        scan = partial(_scan_subtree, ignore_names=ignore_names, max_size=MAX_SIZE)
+        if len(subdirs) > 1:
+            # shard the walk by top-level subdir; half the cores so we
+            # don't oversubscribe against the concurrent LLM calls later
+            workers = max(1, (os.cpu_count() or 2) // 2)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(scan, subdirs))
+        else:
+            results = [scan(d) for d in subdirs]
+
+        for sub_found, sub_big in results:
+            found.extend(sub_found)
+            too_big.extend(sub_big)
+
+        if too_big:
+            for p in too_big:
+                print(f"{p} is too big")
+            sys.exit(2)
+
+        # add the file names as plain strings (keeping the full path);
+        # wrapping each in a Path just re-parses the string for nothing
+        file_names_list.extend(found)
         
         #print(f"{f} is a python file")
         #print(file_names_list)
@@ -109,90 +195,6 @@ def main():
         max_iterations = MAX_ITERATIONS
     )
 
-"""
-    # ── Real pipeline call ───────────────────────────────────────────────
-    result = run_refactoring_pipeline(
-        target_dir=args.dir if args.dir else str(Path(args.file).parent),
-        auditor_prompt="src/prompts/auditor_prompt.txt",
-        fixer_prompt="src/prompts/fixer_prompt.txt",
-        judge_prompt="src/prompts/judge_prompt.txt",
-        files=[str(f) for f in file_names_list],     # list of files to treat, at least 1
-        dep_graph=dependency_graph,                             # here goes the dependency graph
-        max_iterations=MAX_ITERATIONS
-    )
-        #print(f"🚀 DEMARRAGE SUR : {args.dir}")
-        # Log startup
-
-    log_experiment(
-        "System",
-        "unknown",
-        ActionType.ANALYSIS,
-        {
-            "input_prompt": "System startup",
-            "output_response": f"Target directory: {args.target_dir}"
-        },
-        "INFO"
-    )
-   
-    # Prepare payloads (sandbox-safe + size check)
-    payloads = prepare_payloads(args.target_dir, max_file_size=args.max_file_size)
-    print(f"📂 {len(payloads)} fichiers préparés pour l'agent.")
-    # Process each file
-    for payload in payloads:
-        file_path = payload["file_name"]
-        code = payload["content"]
-        print(f"📝 Traitement du fichier: {file_path}")
-       
-        # DEBUG: show the code that was read
-        print("📄 Code lu :")
-        print(code)
-        print("-" * 50)
-   
-        success = attempt_fix(file_path, code, args.max_iterations)
-        if success:
-            print(f"✅ {file_path} corrigé avec succès.")
-        else:
-            print(f"❌ {file_path} n'a pas pu être corrigé après {args.max_iterations} itérations.")
-    print("🚀 MISSION_COMPLETE")
-    # Log shutdown
-    log_experiment(
-        "System",
-        "unknown",
-        ActionType.ANALYSIS,
-        {
-            "input_prompt": "System shutdown",
-            "output_response": f"Target directory: {args.target_dir}"
-        },
-        "INFO"
-    )
-
 
-    print("\n" + "=" * 70)
-    print("   Starting real Refactoring Pipeline   ".center(70))
-    print("=" * 70 + "\n")
-
-    # ── Real pipeline call ───────────────────────────────────────────────
-    result = run_refactoring_pipeline(
-        target_dir=args.dir if args.dir else str(Path(args.file).parent),
-        auditor_prompt="src/prompts/auditor_prompt.txt",
-        fixer_prompt="src/prompts/fixer_prompt.txt",
-        judge_prompt="src/prompts/judge_prompt.txt",
-        max_iterations=MAX_ITERATIONS
-        # files=[str(f) for f in file_names_list],     # ← add this line if your pipeline accepts a list of files
-        # dep_graph=graph,                             # ← optional
-    )
-
-    print("\nFinal result:")
-    print(json.dumps(result, indent=2))
-
-    print("\n" + "═" * 70)
-    print("   MISSION COMPLETE   ".center(70, "═"))
-    print("═" * 70)
-
-    """
 if __name__ == "__main__":
     main()
-    
-    
-    
-#this is the running command :  python test.py --target_dir sandbox/test_project --max_iterations 3
@@ -1,17 +1,22 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import functools
+import hashlib
 import os
-import json
-import ast
-from typing import Dict
+import re
+from typing import Dict, List
 
-from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
+from huggingface_hub import AsyncInferenceClient, InferenceClient
 
+from src.agents.registry import get_clients, get_hf_semaphore
+from src.utils import fastjson
+from src.utils.ast_cache import parse_cached
+from src.utils.env import get_env
 from src.utils.logger import log_experiment, ActionType
+from src.utils.prompts import load_prompt
 from src.tools.file_tools import read_file, write_file
 
-load_dotenv()
-
 
 class FixerAgent:
     """
@@ -22,20 +27,64 @@ class FixerAgent:
     def __init__(self, prompt_path: str):
         self.prompt_path = Path(prompt_path)
         self.system_prompt = self._load_prompt()
+        # template pre-split on its placeholders once: assembling a prompt
+        # is then a single join instead of full-string replace passes over
+        # a template that can approach 180 KB
+        self._prompt_parts = re.split(r"(\{PLAN\}|\{CODE\})", self.system_prompt)
+        # code budget fixed at init: truncating the code up front keeps the
+        # assembled prompt under the cap without measuring the ~180 KB
+        # result afterwards (4 KB headroom covers the plan JSON)
+        self._code_budget = 180_000 - len(self.system_prompt) - 4096
 
-        hf_token = os.getenv("HF_TOKEN")
+        hf_token = get_env("HF_TOKEN")
         if not hf_token:
             raise EnvironmentError("❌ HF_TOKEN not found in .env")
-        self.model_name = os.getenv("HF_MODEL")
+        self.model_name = get_env("HF_MODEL")
         if not self.model_name:
             raise EnvironmentError("❌ HF_MODEL not set in .env")
 
-        self.client = InferenceClient(model=self.model_name, token=hf_token)
+        self._hf_token = hf_token
+        # digests of code already known to parse: the judge re-suggests the
+        # same fix across retry iterations and re-validation is then free
+        self._valid_cache: set[bytes] = set()
+
+    # shared pair from the registry, built on first use so sync-only
+    # callers never pay for the async twin and vice versa
+    @functools.cached_property
+    def _client_pair(self):
+        return get_clients(self.model_name, self._hf_token)
+
+    @property
+    def client(self) -> InferenceClient:
+        return self._client_pair[0]
+
+    @property
+    def async_client(self) -> AsyncInferenceClient:
+        return self._client_pair[1]
 
     def _load_prompt(self) -> str:
-        if not self.prompt_path.exists():
+        try:
+            return load_prompt(str(self.prompt_path))
+        except FileNotFoundError:
             raise FileNotFoundError(f"Fixer prompt not found: {self.prompt_path}")
-        return self.prompt_path.read_text(encoding="utf-8")
+
+    def _build_prompt(self, plan: Dict, current_code: str) -> str:
+        # Safety truncation, applied to the code alone so the template and
+        # plan around it survive intact
+        if len(current_code) > self._code_budget:
+            current_code = current_code[:self._code_budget] + "\n# [CODE TRUNCATED]"
+
+        plan_json = fastjson.dumps(plan, indent=True)
+        mapping = {"{PLAN}": plan_json, "{CODE}": current_code}
+        return "".join(mapping.get(part, part) for part in self._prompt_parts)
+
+    @staticmethod
+    def _clean_response(text: str) -> str:
+        text = text.strip()
+        # Remove code fences if LLM added them
+        if text.startswith("```") and text.endswith("```"):
+            text = text.strip("```").strip()
+        return text
 
     def _ask_llm(self, plan: Dict, current_code: str) -> str:
         """
@@ -43,13 +92,8 @@ class FixerAgent:
         The prompt is loaded from file and placeholders {PLAN} and {CODE} are replaced.
         Returns only the fixed code as string.
         """
-        plan_json = json.dumps(plan, indent=2, ensure_ascii=False)
-        prompt_to_use = self.system_prompt.replace("{PLAN}", plan_json).replace("{CODE}", current_code)
+        prompt_to_use = self._build_prompt(plan, current_code)
 
-        # Safety truncation
-        if len(prompt_to_use) > 180_000:
-            prompt_to_use = prompt_to_use[:175_000] + "\n\n[PROMPT TRUNCATED]"
-            
         response = self.client.chat.completions.create(
             model=self.model_name,
             messages=[
@@ -58,19 +102,38 @@ class FixerAgent:
             max_tokens=1000,
             temperature=0.1
         )
-        text = response.choices[0].message.content.strip()
-        # Remove code fences if LLM added them
-        if text.startswith("```") and text.endswith("```"):
-            text = text.strip("```").strip()
-        return text
+        return self._clean_response(response.choices[0].message.content)
+
+    async def _ask_llm_async(self, plan: Dict, current_code: str) -> str:
+        """
+        Async variant of _ask_llm, so several fixes can overlap their
+        network round-trips under one event loop.
+        """
+        prompt_to_use = self._build_prompt(plan, current_code)
+
+        # same shared HF_QPS cap as the auditor, so concurrent fixes and
+        # audits together stay under the provider's rate limit
+        async with get_hf_semaphore():
+            response = await self.async_client.chat_completion(
+                messages=[
+                    {"role": "system", "content": prompt_to_use}
+                ],
+                max_tokens=1000,
+                temperature=0.1
+            )
+        return self._clean_response(response.choices[0].message.content)
+
 
-       
     def _validate_code(self, code: str) -> bool:
-        try:
-            ast.parse(code)
+        h = hashlib.blake2b(code.encode("utf-8", "replace"), digest_size=16).digest()
+        if h in self._valid_cache:
             return True
+        try:
+            parse_cached(code)
         except SyntaxError:
             return False
+        self._valid_cache.add(h)
+        return True
 
     def fix_file(self, file_path: str, refactoring_plan: Dict) -> Dict:
         """
@@ -92,29 +155,63 @@ class FixerAgent:
     
         # Always write to file
         write_file(file_path, fixed_code)
-        changes_applied = fixed_code != current_code
+        return self._fix_result(file_path, current_code, fixed_code)
 
-        return {
+    async def fix_file_async(self, file_path: str, refactoring_plan: Dict) -> Dict:
+        """
+        Async twin of fix_file: same judge-fix preference and write-back,
+        but the LLM call is awaited.
+        """
+        try:
+            current_code = read_file(file_path)
+        except Exception:
+            current_code = ""  # fallback if file cannot be read
+
+        judge_fix = refactoring_plan.get("judge_suggested_fix")
+        if isinstance(judge_fix, str) and len(judge_fix.strip()) > 20 and self._validate_code(judge_fix):
+            fixed_code = judge_fix
+        else:
+            fixed_code = await self._ask_llm_async(refactoring_plan, current_code)
+
+        write_file(file_path, fixed_code)
+        return self._fix_result(file_path, current_code, fixed_code)
+
+    def _fix_result(self, file_path: str, current_code: str, fixed_code: str) -> Dict:
+        result = {
             "agent": "FixerAgent",
             "file": file_path,
             "status": "SUCCESS",
-            "changes_applied": changes_applied,
+            "changes_applied": fixed_code != current_code,
             "original_size": len(current_code),
             "fixed_size": len(fixed_code)
         }
 
-    def apply_refactoring_plan(self, plan_data: Dict) -> Dict:
-        """
-        Apply refactoring plan to all files.
-        Returns a summary dict with results per file.
-        """
+        # log a short preview only: re-rendering the full prompt or
+        # re-dumping the whole plan just for the log would double the
+        # most expensive allocations in this path
+        code_preview = (
+            current_code if len(current_code) <= 500 else current_code[:500] + "..."
+        )
+        log_experiment(
+            agent_name="FixerAgent",
+            model_used=self.model_name,
+            action=ActionType.FIX,
+            details={
+                "input_prompt": code_preview,
+                "output_response": result,
+            },
+            status="SUCCESS",
+        )
+
+        return result
+
+    @staticmethod
+    def _build_jobs(plan_data: Dict) -> List[tuple]:
+        """Resolve files_to_fix entries into (path, per-file plan) pairs."""
         files_to_fix = plan_data.get("files_to_fix", [])
         global_plan = plan_data.get("global_plan", {})
 
-        results = []
-        successful = 0
-        failed = 0
-
+        jobs = []
         for file_info in files_to_fix:
             if isinstance(file_info, str):
                 file_info = {"path": file_info}
@@ -123,18 +220,19 @@ class FixerAgent:
             if not path or not Path(path).is_file():
                 continue
 
-            file_plan = {**global_plan, **file_info, "file_path": path}
-            result = self.fix_file(path, file_plan)
-            results.append(result)
-
-            if result["status"] == "SUCCESS":
-                successful += 1
-            else:
-                failed += 1
+            # one dict alloc per file: copy the shared plan, layer the
+            # per-file info on top
+            file_plan = dict(global_plan)
+            file_plan.update(file_info)
+            file_plan["file_path"] = path
+            jobs.append((path, file_plan))
+        return jobs
 
-        summary = {
+    @staticmethod
+    def _summarize(total_files: int, results: List[Dict], successful: int, failed: int) -> Dict:
+        return {
             "agent": "FixerAgent",
-            "total_files": len(files_to_fix),
+            "total_files": total_files,
             "successful": successful,
             "failed": failed,
             "overall_status": (
@@ -147,4 +245,69 @@ class FixerAgent:
             "file_results": results
         }
 
-        return summary
+    def apply_refactoring_plan(self, plan_data: Dict) -> Dict:
+        """
+        Apply refactoring plan to all files.
+        Returns a summary dict with results per file.
+        """
+        files_to_fix = plan_data.get("files_to_fix", [])
+
+        # build every per-file plan eagerly first
+        jobs = self._build_jobs(plan_data)
+
+        results = []
+        successful = 0
+        failed = 0
+
+        if jobs:
+            # each fix targets its own file, so the blocking LLM calls are
+            # independent and can overlap instead of paying N round-trips
+            max_workers = min(len(jobs), int(os.getenv("FIXER_PARALLELISM", "5")))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(self.fix_file, path, file_plan)
+                    for path, file_plan in jobs
+                ]
+                for future in as_completed(futures):
+                    result = future.result()
+                    results.append(result)
+
+                    if result["status"] == "SUCCESS":
+                        successful += 1
+                    else:
+                        failed += 1
+
+        return self._summarize(len(files_to_fix), results, successful, failed)
+
+    async def apply_refactoring_plan_async(self, plan_data: Dict) -> Dict:
+        """
+        Apply the refactoring plan with all per-file LLM calls gathered
+        under one event loop instead of a thread per file.
+        """
+        files_to_fix = plan_data.get("files_to_fix", [])
+        jobs = self._build_jobs(plan_data)
+
+        raw_results = await asyncio.gather(
+            *(self.fix_file_async(path, file_plan) for path, file_plan in jobs),
+            return_exceptions=True,
+        )
+
+        results = []
+        successful = 0
+        failed = 0
+        for (path, _), result in zip(jobs, raw_results):
+            if isinstance(result, Exception):
+                result = {
+                    "agent": "FixerAgent",
+                    "file": path,
+                    "status": "FAILURE",
+                    "error": str(result),
+                }
+            results.append(result)
+
+            if result["status"] == "SUCCESS":
+                successful += 1
+            else:
+                failed += 1
+
+        return self._summarize(len(files_to_fix), results, successful, failed)
@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import os
+
+from huggingface_hub import AsyncInferenceClient, InferenceClient
+
+
+@functools.lru_cache(maxsize=None)
+def get_clients(model: str, token: str):
+    """
+    One (sync, async) InferenceClient pair per model+token, shared by
+    every agent in the swarm. All LLM calls then ride the same keep-alive
+    connection pool instead of paying TCP+TLS setup per agent instance.
+    """
+    return (
+        InferenceClient(model=model, token=token),
+        AsyncInferenceClient(model=model, token=token),
+    )
+
+
+# one semaphore per event loop: asyncio.run() builds a fresh loop each
+# pipeline run, and a semaphore created under one loop cannot be awaited
+# under another
+_hf_semaphores: dict = {}
+
+
+def get_hf_semaphore() -> asyncio.Semaphore:
+    """
+    Shared in-flight cap for all async HF calls, so gathering a whole
+    batch of audits/fixes cannot slam the provider into 429s.
+    Tune with HF_QPS (default 8 concurrent requests).
+    """
+    loop = asyncio.get_running_loop()
+    sem = _hf_semaphores.get(loop)
+    if sem is None:
+        sem = _hf_semaphores.setdefault(
+            loop, asyncio.Semaphore(int(os.getenv("HF_QPS", "8")))
+        )
+    return sem
@@ -1,29 +1,128 @@
-from collections import defaultdict
+import array
+import ast
+import functools
+import io
+import os
+import tokenize
+from dataclasses import dataclass
 from src.tools.file_tools import read_file
 
-def create_dependency_graph(files):
-    files_map = defaultdict(str)
-    graph = defaultdict(list)
+def _top_level_imports(source, filename):
+    """Module names imported at the top level of a source file."""
+    try:
+        tree = ast.parse(source, filename=filename, type_comments=False)
+    except SyntaxError:
+        # unparseable file: no edges, the auditor will flag it anyway
+        return []
+    names = []
+    # only tree.body, not ast.walk: top-level imports are the common case
+    # and this skips descending into every function body
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.append(alias.name.partition(".")[0])
+        elif isinstance(node, ast.ImportFrom):
+            if node.module and node.level == 0:
+                names.append(node.module.partition(".")[0])
+    return names
 
-    # we start by creating keys for our directory
-    for f in files:
-        graph.setdefault(f.name[:-len(".py")],[])
-        files_map.setdefault(f.name[:-len(".py")],f)
-    # now, we have to read the files and then catch dependencies to fill the graph
+def _top_level_imports_fast(source, filename):
+    """
+    Tokenize-based variant of _top_level_imports: scans the token stream
+    for import/from statements at indent depth 0 without building an AST,
+    the same trick isort and pylint use. Falls back to the AST walk if
+    the token stream is broken mid-file.
+    """
+    names = []
+    depth = 0
+    tokens = tokenize.generate_tokens(io.StringIO(source).readline)
+    try:
+        for tok in tokens:
+            tt = tok.type
+            if tt == tokenize.INDENT:
+                depth += 1
+            elif tt == tokenize.DEDENT:
+                depth -= 1
+            elif depth == 0 and tt == tokenize.NAME:
+                if tok.string == "from":
+                    # from X[.Y] import ... — record X; a leading "." means
+                    # a relative import, which never targets a sandbox file
+                    tok = next(tokens)
+                    if tok.type == tokenize.NAME:
+                        names.append(tok.string)
+                    while tok.type != tokenize.NEWLINE:
+                        tok = next(tokens)
+                elif tok.string == "import":
+                    # import A[.B][ as C][, D...] — record each first segment
+                    expect_name = True
+                    while True:
+                        tok = next(tokens)
+                        if tok.type == tokenize.NEWLINE or tok.string == ";":
+                            break
+                        if expect_name and tok.type == tokenize.NAME:
+                            names.append(tok.string)
+                            expect_name = False
+                        elif tok.string == ",":
+                            expect_name = True
+    except (tokenize.TokenError, IndentationError, StopIteration):
+        return _top_level_imports(source, filename)
+    return names
+
+@functools.lru_cache(maxsize=1024)
+def _imports_cached(path_str, mtime_ns, size):
+    """
+    Imports per file, memoized on (path, mtime, size): the pipeline
+    rebuilds the graph every iteration but the fixer only rewrites a few
+    files, so unchanged ones cost a stat + dict hit instead of a re-parse.
+    """
+    return tuple(_top_level_imports_fast(read_file(path_str), path_str))
+
+@dataclass
+class GraphSoA:
+    """
+    Dependency graph in struct-of-arrays form: node i is the file
+    paths[i] / module names[i], and adj[i] holds the integer ids it
+    imports. Edge building is then int appends into compact arrays
+    instead of hashing Path objects per lookup.
+    """
+    names: list
+    paths: list
+    adj: list  # one array.array("i") of node ids per node
 
+    def to_path_dict(self):
+        """Legacy view: {path: [imported paths]} for existing consumers."""
+        paths = self.paths
+        return {paths[i]: [paths[j] for j in row] for i, row in enumerate(self.adj)}
+
+def create_dependency_soa(files) -> GraphSoA:
+    # map each module name to its node id once, then resolving an import
+    # is a single dict .get instead of scanning every key per line
+    # (files may be plain str paths or Path objects, basename handles both)
+    names = []
+    paths = []
+    name_to_id = {}
     for f in files:
-        # start by reading each file and extracting the imports from it
-        content = read_file(f)
-        content = [line for line in content.split('\n') if (not line == "") and "import" in line ]
-        file_name = f.name[:-len(".py")]
-        # now, in each file, we check the sentence after import, and check if it has any key we included
-        for line in content:
-            words = line.split(" ")
-            for key in graph.keys():
-                if key in words[1]:
-                    graph[file_name].append(files_map.get(key))
-    keys = list(graph.keys())
-    for key in keys:
-        graph[files_map[key]] = graph.pop(key)
-        #print(files_map.get(key), " ", graph.get(key))
-    return graph
\ No newline at end of file
+        module = os.path.basename(str(f))[:-len(".py")]
+        if name_to_id.setdefault(module, len(names)) == len(names):
+            names.append(module)
+            paths.append(f)
+
+    adj = [array.array("i") for _ in names]
+    resolve = name_to_id.get  # local alias, skips the attribute lookup per import
+    for src_id, f in enumerate(paths):
+        try:
+            st = os.stat(str(f))
+            imported = _imports_cached(str(f), st.st_mtime_ns, st.st_size)
+        except OSError:
+            imported = _top_level_imports_fast(read_file(f), str(f))
+        # real AST imports instead of the old substring scan, which matched
+        # any module whose name merely contained a key
+        row = adj[src_id]
+        for name in imported:
+            dst_id = resolve(name)
+            if dst_id is not None and dst_id != src_id:
+                row.append(dst_id)
+    return GraphSoA(names=names, paths=paths, adj=adj)
+
+def create_dependency_graph(files):
+    return create_dependency_soa(files).to_path_dict()
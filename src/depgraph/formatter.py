@@ -1,5 +1,20 @@
 from collections import defaultdict
 
+def format_dependency_soa(soa) -> str:
+    """
+    Format a GraphSoA without round-tripping through the path dict:
+    one sort over integer ids keyed on the prebuilt names list, then
+    direct indexing into paths/adj.
+    """
+    names = soa.names
+    paths = soa.paths
+    lines = []
+    for i in sorted(range(len(names)), key=names.__getitem__):
+        row = soa.adj[i]
+        values_str = ", ".join(str(paths[j]) for j in row) if len(row) else "None"
+        lines.append(f"{paths[i]} -> {values_str}")
+    return "\n".join(lines)
+
 def format_dependency_graph(depgraph) -> str:
     """
     Format a dependency graph into a readable string.
@@ -1,20 +1,61 @@
-import json
+import asyncio
+import hashlib
 import os
 from pathlib import Path
 from typing import Dict, Any, List
 
-from langchain.memory import ConversationBufferMemory
-
-from src.agents.auditor import AuditorAgent
+from src.agents.auditor import AuditorAgent, load_audit_cache, save_audit_cache
 from src.agents.fixer import FixerAgent
 from src.agents.judge import JudgeAgent
 
-from src.tools.analysis_tools import run_pytest, run_pylint
-from src.tools.file_tools import read_file
+from src.tools.analysis_tools import run_analysis
+from src.tools.file_tools import read_file_bytes
 from src.utils.logger import log_experiment, ActionType
+from src.utils import fastjson
+
+from src.depgraph.depgraph import create_dependency_soa
+from src.depgraph.formatter import format_dependency_soa
+
+
+# static planner instructions, hoisted to a module constant so every
+# iteration's planner call starts with byte-identical leading tokens —
+# the layout provider-side prefix caching needs. All volatile content
+# (graph, audit reports) is appended strictly after it.
+_PLANNER_INSTRUCTIONS = """
+    You are a senior software refactoring planner.
 
-from src.depgraph.depgraph import create_dependency_graph
-from src.depgraph.formatter import format_dependency_graph
+    Using the COMPLETE MEMORY below:
+    - Dependency graph
+    - Initial strategy
+    - All audit reports
+
+    Create ONE consolidated refactoring plan.
+
+    Rules:
+    - Fix files in correct dependency order
+    - Group related issues
+    - Avoid unnecessary rewrites
+    - Output JSON with:
+      - files_to_fix (list of dicts)
+      - per-file issues
+      - suggested changes
+      - dependency rationale
+
+    MEMORY:
+    """
+
+
+def _clip(s: str, head: int = 65536, tail: int = 16384) -> str:
+    """
+    Cap huge pytest/pylint dumps to head+tail bytes before they fan out
+    into the judge's filters, json.dumps and the logger — each of those
+    copies the whole string, so clipping once keeps every downstream
+    allocation bounded. The head keeps the summary/first failures, the
+    tail keeps the final score lines.
+    """
+    if len(s) <= head + tail:
+        return s
+    return s[:head] + "\n...[truncated]...\n" + s[-tail:]
 
 
 class RefactoringPipeline:
@@ -33,32 +74,81 @@ class RefactoringPipeline:
         self.max_iterations = max_iterations
         self.require_logging = require_logging_check
 
-        # Agents
+        # incremental-audit state: last seen (mtime_ns, size) and report
+        # per file, used when PIPELINE_INCREMENTAL=1
+        self._file_state: Dict[str, tuple] = {}
+        self._last_reports: Dict[str, Dict[str, Any]] = {}
+
+        # Agents (seed the auditor's response cache from the last run first)
+        load_audit_cache()
         self.auditor = AuditorAgent(str(auditor_prompt_path))
         self.fixer = FixerAgent(str(fixer_prompt_path))
         self.judge = JudgeAgent(str(judge_prompt_path))
 
-        # Global memory for storing audit results, plans, etc.
-        self.memory = ConversationBufferMemory(
-            memory_key="refactor_memory",
-            return_messages=True
+        # Fact store instead of a growing conversation transcript: one
+        # canonical audit report per file (overwritten on re-audit) plus
+        # the latest dependency-graph text. The planner prompt then stays
+        # O(files) instead of O(iterations × files).
+        self.audit_store: Dict[str, Dict[str, Any]] = {}
+        self.depgraph_text = ""
+
+        # the fixer-facing file list never changes between iterations:
+        # user files first, then test_ files, same empty slots every time.
+        # Built once here; build_global_plan_from_memory copies the dicts
+        # so iterations can't leak state into each other. The fixed order
+        # also keeps the downstream prompts byte-stable across iterations.
+        ordered = sorted(
+            self.files,
+            key=lambda fp: os.path.basename(str(fp)).startswith("test_"),
         )
+        self._files_to_fix_template = [
+            {
+                "path": str(file_path),
+                "issues": [],
+                "suggestions": [],
+                "latest_pytest_output": "",
+                "latest_pylint_output": "",
+                "llm_feedback": ""
+            }
+            for file_path in ordered
+        ]
 
     # ─────────────────────────────────────────────────────────────
     # Step 1: Dependency graph → initial strategy
     # ─────────────────────────────────────────────────────────────
-    def generate_initial_plan_from_graph(self) -> Dict[str, Any]:
-        
-        depgraph = create_dependency_graph(self.files)
-        formatted = format_dependency_graph(depgraph)
+    def _depgraph_cache_key(self) -> str | None:
+        """Digest over all file contents — same sources, same graph."""
+        try:
+            digests = sorted(
+                hashlib.blake2b(read_file_bytes(str(f)), digest_size=16).digest()
+                for f in self.files
+            )
+        except OSError:
+            return None
+        return hashlib.blake2b(b"".join(digests), digest_size=16).hexdigest()
 
-        self.memory.save_context(
-            {"input": "Dependency graph"},
-            {"output": formatted}
+    def generate_initial_plan_from_graph(self) -> Dict[str, Any]:
+        # re-runs over identical sources reuse the cached plan instead of
+        # re-parsing every file for the graph
+        key = self._depgraph_cache_key()
+        cache_file = (
+            Path(".refactor_cache") / "depgraph" / f"{key}.json" if key else None
         )
+        if cache_file is not None:
+            try:
+                plan = fastjson.loads(cache_file.read_bytes())
+                self.depgraph_text = plan["dependency_graph"]
+                return plan
+            except (OSError, ValueError, KeyError):
+                pass
+
+        depgraph = create_dependency_soa(self.files)
+        formatted = format_dependency_soa(depgraph)
+        self.depgraph_text = formatted
 
         # Leaf-first order: files with no dependencies first
-        ordered_files = sorted(depgraph.keys(), key=lambda f: len(depgraph[f]))
+        order = sorted(range(len(depgraph.paths)), key=lambda i: len(depgraph.adj[i]))
+        ordered_files = [depgraph.paths[i] for i in order]
 
         plan = {
             "strategy": "Fix leaf dependencies first",
@@ -66,99 +156,149 @@ class RefactoringPipeline:
             "dependency_graph": formatted,
         }
 
-        self.memory.save_context(
-            {"input": "Initial dependency-based plan"},
-            {"output": json.dumps(plan, indent=2)}
-        )
+        if cache_file is not None:
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                cache_file.write_text(fastjson.dumps(plan), encoding="utf-8")
+            except OSError:
+                pass  # cache is best-effort
 
         return plan
 
     # ─────────────────────────────────────────────────────────────
     # Step 2: Audit all files
     # ─────────────────────────────────────────────────────────────
+    async def _audit_one(self, file_path) -> Dict[str, Any]:
+        # raw bytes: the auditor scans them directly and decodes once.
+        # The read goes through to_thread so a slow disk never stalls the
+        # other in-flight audits.
+        code = await asyncio.to_thread(read_file_bytes, file_path)
+        return await self.auditor.audit_async(
+            file_path=str(file_path),
+            code=code,
+            require_logging=self.require_logging
+        )
+
+    @staticmethod
+    def _current_state(file_path) -> tuple | None:
+        try:
+            st = os.stat(str(file_path))
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
     def audit_files(self) -> List[Dict[str, Any]]:
         reports = []
+        if not self.files:
+            return reports
+
+        # with PIPELINE_INCREMENTAL=1, files the fixer did not touch since
+        # the last iteration (same mtime+size) reuse their previous report
+        # and skip the read + audit entirely
+        incremental = os.getenv("PIPELINE_INCREMENTAL") == "1"
+        states = {}
+        to_audit = []
+        for fp in self.files:
+            key = str(fp)
+            state = self._current_state(fp)
+            states[key] = state
+            if (incremental and state is not None
+                    and self._file_state.get(key) == state
+                    and key in self._last_reports):
+                continue
+            to_audit.append(fp)
+
+        # audits are independent LLM round-trips, so gather them all under
+        # one event loop — coroutines instead of a thread per file, with
+        # in-flight concurrency capped by the shared HF_QPS semaphore
+        # inside the auditor's async client. Results come back in
+        # submission order so memory stays deterministic for the planner.
+        fresh: Dict[str, Dict[str, Any]] = {}
+        if to_audit:
+            async def _gather_audits():
+                return await asyncio.gather(
+                    *(self._audit_one(fp) for fp in to_audit)
+                )
+
+            for fp, report in zip(to_audit, asyncio.run(_gather_audits())):
+                fresh[str(fp)] = report
 
         for file_path in self.files:
-            code = read_file(file_path)
-            report = self.auditor.audit(
-                file_path=str(file_path),
-                code=code,
-                require_logging=self.require_logging
-            )
+            key = str(file_path)
+            report = fresh.get(key)
+            if report is None:
+                report = self._last_reports[key]
+            else:
+                self._file_state[key] = states[key]
+                self._last_reports[key] = report
             reports.append(report)
-
-            self.memory.save_context(
-                {"input": f"Audit report for {file_path.name}"},
-                {"output": json.dumps(report, indent=2)}
-            )
+            # overwrite, not append: the store keeps exactly one current
+            # report per file no matter how many iterations have run
+            self.audit_store[key] = report
 
         return reports
 
     # ─────────────────────────────────────────────────────────────
     # Step 3: Build consolidated plan from memory
     # ─────────────────────────────────────────────────────────────
-    def build_global_plan_from_memory(self) -> Dict[str, Any]:
-        memory_text = self.memory.load_memory_variables({})["refactor_memory"]
-
-        planner_prompt = f"""
-    You are a senior software refactoring planner.
-
-    Using the COMPLETE MEMORY below:
-    - Dependency graph
-    - Initial strategy
-    - All audit reports
+    @staticmethod
+    def _trim(text: Any, limit: int = 200) -> str:
+        text = str(text)
+        return text if len(text) <= limit else text[:limit] + "..."
+
+    def _summarize_audits(self) -> Dict[str, Any]:
+        """
+        Compress the audit store for the planner prompt. Issues repeated
+        across files are bucketed once with a count and the affected
+        files; one-off issues stay under their file. The planner only
+        ranks and groups problems, so this loses nothing it needs while
+        the prompt shrinks from O(files × issues) to O(distinct issues).
+        The full reports stay in audit_store for the fixer.
+        """
+        buckets: Dict[str, Dict[str, Any]] = {}
+        statuses: Dict[str, str] = {}
+        for key, report in self.audit_store.items():
+            statuses[key] = f"{report.get('status', '?')}/{report.get('severity', '?')}"
+            for issue in report.get("issues", []):
+                bucket = buckets.setdefault(self._trim(issue), {"count": 0, "files": []})
+                bucket["count"] += 1
+                bucket["files"].append(key)
+
+        common_issues = {}
+        unique_issues: Dict[str, List[str]] = {}
+        for issue, bucket in buckets.items():
+            if bucket["count"] > 1:
+                common_issues[issue] = bucket
+            else:
+                unique_issues.setdefault(bucket["files"][0], []).append(issue)
 
-    Create ONE consolidated refactoring plan.
+        return {
+            "files": statuses,
+            "common_issues": common_issues,
+            "unique_issues": unique_issues,
+        }
 
-    Rules:
-    - Fix files in correct dependency order
-    - Group related issues
-    - Avoid unnecessary rewrites
-    - Output JSON with:
-      - files_to_fix (list of dicts)
-      - per-file issues
-      - suggested changes
-      - dependency rationale
+    def build_global_plan_from_memory(self) -> Dict[str, Any]:
+        memory_text = (
+            "Dependency graph:\n"
+            f"{self.depgraph_text}\n\n"
+            "Audit summary (issues bucketed by rule, counts and files):\n"
+            f"{fastjson.dumps(self._summarize_audits())}"
+        )
 
-    MEMORY:
-    {memory_text}
-    """
+        planner_prompt = _PLANNER_INSTRUCTIONS + memory_text
 
         response = self.fixer._ask_llm(plan={"dummy": True}, current_code=planner_prompt)
 
         try:
-            raw_plan = json.loads(response)
+            raw_plan = fastjson.loads(response)
         except Exception:
             raw_plan = {"note": "LLM output not valid JSON", "file_order": []}
 
         # --- Convert to Fixer-compatible structure ---
-        files_to_fix = []
-        
-        # Add all user files first (skip test files)
-        for file_path in self.files:
-            if not file_path.name.startswith("test_"):
-                files_to_fix.append({
-                    "path": str(file_path),
-                    "issues": [],
-                    "suggestions": [],
-                    "latest_pytest_output": "",
-                    "latest_pylint_output": "",
-                    "llm_feedback": ""
-                })
-        
-        # Now optionally append test files (so they get linted/audited later)
-        for file_path in self.files:
-            if file_path.name.startswith("test_"):
-                files_to_fix.append({
-                    "path": str(file_path),
-                    "issues": [],
-                    "suggestions": [],
-                    "latest_pytest_output": "",
-                    "latest_pylint_output": "",
-                    "llm_feedback": ""
-                })
-
+        # shallow dict copies of the precomputed template: the nested
+        # lists are replaced wholesale downstream, never mutated in place
+        files_to_fix = [dict(entry) for entry in self._files_to_fix_template]
 
         plan = {
             "files_to_fix": files_to_fix,
@@ -167,11 +307,6 @@ class RefactoringPipeline:
             }
         }
 
-        self.memory.save_context(
-            {"input": "Final global refactoring plan"},
-            {"output": json.dumps(plan, indent=2)}
-        )
-
         return plan
 
     # ─────────────────────────────────────────────────────────────
@@ -182,6 +317,15 @@ class RefactoringPipeline:
         success = False
         history = []
         final_status = "MAX_ITERATIONS_REACHED"
+        # constant across iterations, no need to re-read the env each loop
+        model_env = os.getenv("HF_MODEL", "unknown")
+        last_pytest = None
+        last_pylint = None
+        # stall detection: iterations that end in the same (fix status,
+        # decision, reason) are going in circles — the fixer keeps hitting
+        # the same wall and each lap costs the full LLM + analysis budget
+        last_signature = None
+        stall_repeats = 0
 
         print("🔍 Generating initial dependency-based plan...")
         self.generate_initial_plan_from_graph()
@@ -197,12 +341,38 @@ class RefactoringPipeline:
             global_plan = self.build_global_plan_from_memory()
 
             print("🛠 Applying fixes...")
+            # snapshot mtime+size before fixing to detect real edits below
+            pre_states = {str(fp): self._current_state(fp) for fp in self.files}
             fix_result = self.fixer.apply_refactoring_plan(global_plan)
 
-            # Run tests & lint
+            # Run tests & lint (concurrently, they are independent subprocesses)
             print("⚖️ Running tests & lint...")
-            pytest_output = run_pytest(target_dir)
-            pylint_output = run_pylint(target_dir)
+            changed = [
+                str(fp) for fp in self.files
+                if self._current_state(fp) != pre_states[str(fp)]
+            ]
+            if not changed and last_pytest is not None:
+                # the fixer rewrote nothing, so both tools would re-scan an
+                # identical tree — reuse the previous iteration's outputs
+                print("   (no files changed, reusing previous analysis outputs)")
+                pytest_output, pylint_output = last_pytest, last_pylint
+            else:
+                # incremental mode scopes pylint to the rewritten files and
+                # pytest to the last failures once a full baseline run exists
+                scoped = (
+                    os.getenv("PIPELINE_INCREMENTAL") == "1"
+                    and last_pytest is not None
+                    and len(changed) < len(self.files)
+                )
+                if scoped:
+                    pytest_output, pylint_output = run_analysis(
+                        target_dir, files=changed, last_failed=True
+                    )
+                else:
+                    pytest_output, pylint_output = run_analysis(target_dir)
+                pytest_output = _clip(pytest_output)
+                pylint_output = _clip(pylint_output)
+                last_pytest, last_pylint = pytest_output, pylint_output
 
             judgement = self.judge.evaluate(pytest_output, pylint_output)
 
@@ -223,7 +393,7 @@ class RefactoringPipeline:
             # Log iteration
             log_experiment(
                 agent_name="Pipeline-Orchestrator",
-                model_used=os.getenv("HF_MODEL", "unknown"),
+                model_used=model_env,
                 action=ActionType.ANALYSIS,
                 details={
                     "iteration": iteration,
@@ -241,6 +411,25 @@ class RefactoringPipeline:
                 print("\n🎉 Pipeline succeeded, stopping iterations.")
                 break
 
+            signature = (
+                fix_result.get("overall_status", "UNKNOWN"),
+                judgement["decision"],
+                judgement["reason"],
+            )
+            if signature == last_signature:
+                stall_repeats += 1
+                if stall_repeats >= 2:
+                    final_status = "STALL"
+                    print("\n🛑 Pipeline stalled (no progress over "
+                          "consecutive iterations), stopping early.")
+                    break
+            else:
+                last_signature = signature
+                stall_repeats = 0
+
+        # persist audit responses so a re-run over unchanged files is free
+        save_audit_cache()
+
         return {
             "status": final_status,
             "success": success,
@@ -1,31 +1,62 @@
+import collections
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from src.tools.security import ensure_in_sandbox
 
+# pylint on a big repo can emit megabytes; only the tail ever reaches the
+# judge, so a ring buffer of the last lines bounds memory to a few KB
+_MAX_OUTPUT_LINES = 200
+
 
 def _run_command(command: list[str], cwd: str | None = None) -> str:
     """
-    Run a shell command safely and return combined output (stdout + stderr).
+    Run a shell command safely and return combined output (stdout and
+    stderr merged, last _MAX_OUTPUT_LINES lines only).
     Never raises an exception.
     """
     try:
-        result = subprocess.run(
+        proc = subprocess.Popen(
             command,
             cwd=cwd,
-            capture_output=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
-            timeout=20  
         )
-        return result.stdout + result.stderr
-    except subprocess.TimeoutExpired:
-        return "ERROR: Command timed out."
+
+        buf = collections.deque(maxlen=_MAX_OUTPUT_LINES)
+
+        def _drain():
+            # reading continuously also means the pipe can never fill up
+            # and deadlock the child, which capture_output risked on
+            # outputs beyond the pipe buffer
+            with proc.stdout:
+                for line in proc.stdout:
+                    buf.append(line)
+
+        reader = threading.Thread(target=_drain, daemon=True)
+        reader.start()
+
+        try:
+            proc.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            return "ERROR: Command timed out."
+
+        reader.join(timeout=5)
+        return "".join(buf)
     except Exception as e:
         return f"ERROR: {str(e)}"
 
 
-def run_pylint(target_path: str) -> str:
+def run_pylint(target_path: str, files: list[str] | None = None) -> str:
     """
     Run pylint on a file or directory.
+    When `files` is given, lint only those paths instead of the whole
+    target — the cost then scales with the changed subset.
     Returns the pylint output as string.
     """
     path = Path(target_path)
@@ -37,12 +68,22 @@ def run_pylint(target_path: str) -> str:
     if path.is_file():
         ensure_in_sandbox(path)
 
-    return _run_command(["pylint", str(path)])
+    # -j 0 lets pylint fan its AST checks out over all cores
+    if files:
+        # scoped paths come from the pipeline, but validate them like any
+        # other path input — nothing outside the sandbox reaches pylint
+        for f in files:
+            ensure_in_sandbox(f)
+        return _run_command(["pylint", "-j", "0", *files])
+    return _run_command(["pylint", "-j", "0", str(path)])
 
 
-def run_pytest(target_dir: str) -> str:
+def run_pytest(target_dir: str, last_failed: bool = False) -> str:
     """
     Run pytest on a directory.
+    With last_failed=True only the tests that failed in the previous run
+    are collected (--lf); pytest falls back to the full suite when its
+    cache has no failures recorded.
     Returns pytest output as string.
     """
     path = Path(target_dir)
@@ -53,4 +94,25 @@ def run_pytest(target_dir: str) -> str:
     # Enforce sandbox safety
     ensure_in_sandbox(path)
 
-    return _run_command(["pytest", str(path)])
+    command = ["pytest", str(path)]
+    if last_failed:
+        command.insert(1, "--lf")
+    return _run_command(command)
+
+
+def run_analysis(
+    target_dir: str,
+    files: list[str] | None = None,
+    last_failed: bool = False,
+) -> tuple[str, str]:
+    """
+    Run pytest and pylint on the same target concurrently.
+    The two subprocesses are independent, so the judge phase costs
+    max(pytest, pylint) instead of their sum. `files`/`last_failed`
+    scope the runs for incremental iterations.
+    Returns (pytest_output, pylint_output).
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pytest_future = executor.submit(run_pytest, target_dir, last_failed)
+        pylint_output = run_pylint(target_dir, files)
+    return pytest_future.result(), pylint_output
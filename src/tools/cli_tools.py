@@ -1,5 +1,6 @@
 from pathlib import Path
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from src.tools.file_tools import list_python_files, read_file, ensure_in_sandbox
 
 # -----------------------
@@ -46,13 +47,19 @@ def prepare_payloads(target_dir: str, max_file_size: int = 100_000) -> list[dict
     Scan target_dir for Python files, format each for LLM.
     """
     files = list_python_files(target_dir)
-    payloads = []
+    if not files:
+        return []
 
-    for f in files:
+    def _safe_format(f: str) -> dict | None:
         try:
-            payload = format_code_for_llm(f, max_file_size=max_file_size)
-            payloads.append(payload)
+            return format_code_for_llm(f, max_file_size=max_file_size)
         except ValueError as e:
             print(f"Skipping file: {e}")
+            return None
 
-    return payloads
+    # reading many small files is I/O bound; a few threads overlap the
+    # stats and reads while results keep the list_python_files order
+    with ThreadPoolExecutor(max_workers=min(16, len(files))) as executor:
+        results = executor.map(_safe_format, files)
+
+    return [payload for payload in results if payload is not None]
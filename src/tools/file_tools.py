@@ -1,46 +1,108 @@
 from pathlib import Path
+import filecmp
+import functools
+import os
 import shutil
 from src.depgraph.formatter import format_dependency_graph
 from src.tools.security import ensure_in_sandbox
 
+# default open() buffering is st_blksize (often 4 KiB); 128 KiB cuts the
+# number of read syscalls on bigger sources
+_READ_BUFFER_SIZE = 128 * 1024
+# below this size a single os.read is one syscall, no buffer layer needed
+_SMALL_FILE_SIZE = 16 * 1024
+
 
 def list_python_files(target_dir: str) -> list[str]:
     """
     Recursively list all Python files in a directory.
     Ignores __pycache__ folders.
+    One os.scandir pass with a manual stack: entry names/paths stay plain
+    strings and is_dir() reuses the readdir type info, so no Path objects
+    and no extra stat per entry like rglob pays.
     """
-    base = Path(target_dir)
+    base = os.path.realpath(target_dir)
 
-    if not base.exists():
+    if not os.path.isdir(base):
         raise FileNotFoundError(f"Target directory not found: {target_dir}")
 
     files = []
-    for path in base.rglob("*.py"):
-        if "__pycache__" not in path.parts:
-            files.append(str(path.resolve()))
+    stack = [base]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != "__pycache__":
+                            stack.append(entry.path)
+                    elif entry.name.endswith(".py") and entry.is_file():
+                        files.append(entry.path)
+        except OSError:
+            continue  # unreadable dir: skip it, like rglob silently did
     return files
 
 
+@functools.lru_cache(maxsize=256)
+def _read_cached(path: str, mtime_ns: int, size: int) -> str:
+    data = read_file_bytes(path)
+    # utf-8-sig only differs from utf-8 by the BOM, so sniff the three
+    # bytes instead of paying a second full decode attempt for it
+    if data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        # latin1 maps every byte value, so this fallback cannot fail
+        return data.decode("latin1")
+
+
 def read_file(file_path):
-    encodings = ["utf-8", "utf-8-sig", "latin1"]
-    for enc in encodings:
+    # several consumers (audit, depgraph, prompt assembly) read the same
+    # file within an iteration; the (mtime, size) key shares one read and
+    # decode between them and self-invalidates when the fixer rewrites it
+    st = os.stat(file_path)
+    return _read_cached(str(file_path), st.st_mtime_ns, st.st_size)
+
+
+def read_file_bytes(file_path) -> bytes:
+    """
+    Read a file as raw bytes, no decoding.
+    Lets callers run byte-level scans and decode only when they need text.
+    Small files are read with a single os.read; bigger ones get a 128 KiB
+    buffer instead of the default block-size one.
+    """
+    size = os.stat(file_path).st_size
+    if size < _SMALL_FILE_SIZE:
+        fd = os.open(str(file_path), os.O_RDONLY)
         try:
-            with open(file_path, "r", encoding=enc) as f:
-                return f.read()
-        except Exception:
-            continue
-    raise ValueError(f"Cannot read file {file_path} with supported encodings")
+            return os.read(fd, size)
+        finally:
+            os.close(fd)
+
+    with open(file_path, "rb", buffering=_READ_BUFFER_SIZE) as f:
+        return f.read()
 
 
 def backup_file(path: str) -> None:
     """
     Create a backup of a file with .bak suffix.
+    copyfile skips the permission-copying pass of shutil.copy, and an
+    existing backup that already matches (cheap size check first, then
+    content) is left alone instead of being rewritten.
     """
     file_path = Path(path)
 
-    if file_path.exists():
-        backup_path = file_path.with_suffix(file_path.suffix + ".bak")
-        shutil.copy(file_path, backup_path)
+    if not file_path.exists():
+        return
+
+    backup_path = file_path.with_suffix(file_path.suffix + ".bak")
+    try:
+        if (backup_path.stat().st_size == file_path.stat().st_size
+                and filecmp.cmp(file_path, backup_path, shallow=False)):
+            return
+    except OSError:
+        pass  # no backup yet (or unreadable): just write one
+    shutil.copyfile(file_path, backup_path)
 
 
 def write_file(path: str, content: str) -> None:
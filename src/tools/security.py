@@ -1,4 +1,6 @@
 from pathlib import Path
+import functools
+import os
 
 def get_project_root() -> Path:
     """
@@ -15,6 +17,16 @@ def get_sandbox_root() -> Path:
     return get_project_root() / "sandbox"
 
 
+@functools.cache
+def _sandbox_root_str() -> str:
+    """
+    Resolved sandbox root as a plain string, computed once per process.
+    The root never moves at runtime, yet every ensure_in_sandbox call was
+    re-resolving it (several stat syscalls each time).
+    """
+    return str(get_sandbox_root().resolve())
+
+
 def ensure_in_sandbox(path: str | Path) -> None:
     """
     Ensures that a given path is inside the sandbox directory.
@@ -25,15 +37,15 @@ def ensure_in_sandbox(path: str | Path) -> None:
     - absolute paths
     - symlinks
     """
-    sandbox_root = get_sandbox_root().resolve()
-    target_path = Path(path).resolve()
+    root = _sandbox_root_str()
+    # realpath does the same symlink resolution as Path.resolve without
+    # building a Path object, and a string prefix check replaces the
+    # exception-driven relative_to probe
+    target = os.path.realpath(os.fspath(path))
 
-    try:
-        # Will raise ValueError if target_path is outside sandbox
-        target_path.relative_to(sandbox_root)
-    except ValueError:
+    if target != root and not target.startswith(root + os.sep):
         raise ValueError(
-            f"SECURITY VIOLATION: Attempt to access path outside sandbox:\n{target_path}"
+            f"SECURITY VIOLATION: Attempt to access path outside sandbox:\n{target}"
         )
 
 
@@ -0,0 +1,20 @@
+import ast
+import hashlib
+
+# parsed trees keyed by a fast content digest: the audit → fix → judge loop
+# parses the same source several times per iteration, and the tree for an
+# unchanged file never changes
+_parse_cache: dict[bytes, ast.AST] = {}
+
+
+def parse_cached(code: str) -> ast.AST:
+    """
+    ast.parse with memoization. Raises SyntaxError exactly like ast.parse;
+    only successful parses are cached.
+    """
+    key = hashlib.blake2b(code.encode("utf-8", "replace"), digest_size=16).digest()
+    tree = _parse_cache.get(key)
+    if tree is None:
+        tree = ast.parse(code)
+        _parse_cache[key] = tree
+    return tree
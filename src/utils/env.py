@@ -0,0 +1,24 @@
+import functools
+import os
+
+from dotenv import load_dotenv
+
+_loaded = False
+
+
+def ensure_env() -> None:
+    """
+    Parse the .env file exactly once per process, however many agents
+    get constructed or modules imported.
+    """
+    global _loaded
+    if not _loaded:
+        load_dotenv()
+        _loaded = True
+
+
+@functools.lru_cache(maxsize=None)
+def get_env(name: str) -> str | None:
+    """Cached lookup for settings that never change mid-run (HF_TOKEN, HF_MODEL, ...)."""
+    ensure_env()
+    return os.getenv(name)
@@ -0,0 +1,62 @@
+import ctypes
+import functools
+import os
+import struct
+
+# statx(2) constants (linux/stat.h)
+AT_FDCWD = -100
+AT_SYMLINK_NOFOLLOW = 0x100
+AT_STATX_DONT_SYNC = 0x4000
+STATX_SIZE = 0x200
+
+# struct statx is 256 bytes; stx_size is a __u64 that sits after
+# mask(4) + blksize(4) + attributes(8) + nlink(4) + uid(4) + gid(4)
+# + mode(2) + spare(2) + ino(8) = offset 40
+_STATX_BUF_SIZE = 256
+_STX_SIZE_OFFSET = 40
+
+
+@functools.cache
+def _statx():
+    """
+    Locate libc's statx once and probe that the kernel supports it
+    (kernel >= 4.11). Returns None when unavailable so callers fall
+    back to os.stat.
+    """
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fn = libc.statx
+    except (OSError, AttributeError):
+        return None
+
+    fn.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int,
+                   ctypes.c_uint, ctypes.c_char_p]
+    fn.restype = ctypes.c_int
+
+    # probe on "." — older kernels answer ENOSYS
+    buf = ctypes.create_string_buffer(_STATX_BUF_SIZE)
+    if fn(AT_FDCWD, b".", AT_STATX_DONT_SYNC, STATX_SIZE, buf) != 0:
+        return None
+    return fn
+
+
+def fast_size(path, dir_fd: int | None = None) -> int:
+    """
+    Return the size of a file, asking the kernel for STATX_SIZE only and
+    allowing cached (unsynced) metadata via AT_STATX_DONT_SYNC.
+    Falls back to a regular os.stat where statx is unavailable.
+    """
+    fn = _statx()
+    if fn is not None:
+        buf = ctypes.create_string_buffer(_STATX_BUF_SIZE)
+        rc = fn(
+            AT_FDCWD if dir_fd is None else dir_fd,
+            os.fsencode(path),
+            AT_STATX_DONT_SYNC | AT_SYMLINK_NOFOLLOW,
+            STATX_SIZE,
+            buf,
+        )
+        if rc == 0:
+            return struct.unpack_from("<Q", buf.raw, _STX_SIZE_OFFSET)[0]
+
+    return os.stat(path, dir_fd=dir_fd, follow_symlinks=False).st_size
@@ -0,0 +1,30 @@
+"""
+JSON helpers for hot paths: orjson when it is installed (2-5x faster,
+C-level encode/decode), stdlib json otherwise. Callers catch
+JSONDecodeError from here so either backend works.
+"""
+
+try:
+    import orjson
+
+    JSONDecodeError = orjson.JSONDecodeError
+
+    def dumps(obj, indent: bool = False) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode()
+
+    def loads(s):
+        return orjson.loads(s)
+
+except ImportError:
+    import json as _json
+
+    JSONDecodeError = _json.JSONDecodeError
+
+    def dumps(obj, indent: bool = False) -> str:
+        return _json.dumps(obj, indent=2 if indent else None, ensure_ascii=False)
+
+    def loads(s):
+        return _json.loads(s)
@@ -1,5 +1,8 @@
+import atexit
 import json
 import os
+import queue
+import threading
 import uuid
 from datetime import datetime
 from enum import Enum
@@ -7,6 +10,12 @@ from enum import Enum
 # Chemin du fichier de logs
 LOG_FILE = os.path.join("logs", "experiment_data.json")
 
+# File producteur/consommateur : les agents déposent leurs entrées ici et
+# un thread démon s'occupe des écritures disque, pour ne jamais bloquer
+# le chemin chaud sur une E/S.
+_LOG_QUEUE: queue.Queue = queue.Queue()
+_BATCH_SIZE = 50
+
 class ActionType(str, Enum):
     """
     Énumération des types d'actions possibles pour standardiser l'analyse.
@@ -57,9 +66,6 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
             )
 
     # --- 3. PRÉPARATION DE L'ENTRÉE ---
-    # Création du dossier logs s'il n'existe pas
-    os.makedirs("logs", exist_ok=True)
-    
     entry = {
         "id": str(uuid.uuid4()),  # ID unique pour éviter les doublons lors de la fusion des données
         "timestamp": datetime.now().isoformat(),
@@ -70,7 +76,17 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
         "status": status
     }
 
-    # --- 4. LECTURE & ÉCRITURE ROBUSTE ---
+    # --- 4. DÉPÔT DANS LA FILE ---
+    # L'écriture réelle est faite par le thread démon ; l'appelant repart
+    # immédiatement sans payer la lecture/réécriture du fichier de logs.
+    _LOG_QUEUE.put_nowait(entry)
+
+
+def _write_batch(batch: list):
+    """Lecture & écriture robuste d'un lot d'entrées (thread démon uniquement)."""
+    # Création du dossier logs s'il n'existe pas
+    os.makedirs("logs", exist_ok=True)
+
     data = []
     if os.path.exists(LOG_FILE):
         try:
@@ -83,8 +99,39 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
             print(f"⚠️ Attention : Le fichier de logs {LOG_FILE} était corrompu. Une nouvelle liste a été créée.")
             data = []
 
-    data.append(entry)
-    
+    data.extend(batch)
+
     # Écriture
     with open(LOG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
\ No newline at end of file
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def _drain_loop():
+    """
+    Consomme la file en continu. Les entrées déjà en attente sont
+    regroupées dans un même lot : une seule relecture/réécriture du
+    fichier au lieu d'une par appel à log_experiment.
+    """
+    while True:
+        batch = [_LOG_QUEUE.get()]
+        try:
+            while len(batch) < _BATCH_SIZE:
+                batch.append(_LOG_QUEUE.get_nowait())
+        except queue.Empty:
+            pass
+
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            print(f"⚠️ Attention : Échec d'écriture des logs ({e}). {len(batch)} entrée(s) perdue(s).")
+        finally:
+            for _ in batch:
+                _LOG_QUEUE.task_done()
+
+
+_writer_thread = threading.Thread(target=_drain_loop, name="log-writer", daemon=True)
+_writer_thread.start()
+
+# Le thread est démon : on vide explicitement la file avant la fin du
+# processus pour ne perdre aucune entrée.
+atexit.register(_LOG_QUEUE.join)
\ No newline at end of file
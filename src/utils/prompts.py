@@ -0,0 +1,18 @@
+import functools
+import mmap
+import os
+
+
+@functools.lru_cache(maxsize=16)
+def load_prompt(path: str) -> str:
+    """
+    Read a prompt file once per process. The file is mapped rather than
+    read() so decoding works straight off the kernel page cache with no
+    intermediate buffer copy; the lru_cache makes re-instantiating agents
+    zero-I/O.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:].decode("utf-8")
@@ -1,2 +0,0 @@
-MAX_ITERATIONS = 5 # the default value of the number of iterations to do
-MAX_SIZE = 50 * 1024 # this is the initial value of the max size of a single file we read
\ No newline at end of file